@@ -0,0 +1,50 @@
+import threading
+
+
+class AdmissionLimit:
+    """Counts work in progress against a fixed limit
+
+    Like a bounded semaphore, except that ``hold_until_done(future)`` keeps a
+    slot taken for a model call its caller gave up waiting for: the thread
+    running it is still busy, so new work should not be admitted in its
+    place until it finishes. Held slots may take the count past the limit
+    for a while; nothing is admitted until it drops back under.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._in_use = 0
+        self._condition = threading.Condition()
+
+    def in_use(self):
+        return self._in_use
+
+    def acquire(self, blocking=True, timeout=None):
+        with self._condition:
+            if not blocking:
+                timeout = 0
+            if not self._condition.wait_for(lambda: self._in_use < self.limit, timeout):
+                return False
+            self._in_use += 1
+            return True
+
+    def release(self):
+        with self._condition:
+            if self._in_use <= 0:
+                raise ValueError("AdmissionLimit released too many times")
+            self._in_use -= 1
+            self._condition.notify()
+
+    def hold_until_done(self, future):
+        """Take a slot, regardless of the limit, until future finishes"""
+        with self._condition:
+            self._in_use += 1
+        future.add_done_callback(lambda _: self.release())
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
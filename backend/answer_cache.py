@@ -0,0 +1,153 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from retrieval import ARABIC_DIACRITICS_RE, ARABIC_LETTER_MAP
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize_question(question):
+    """Reduce a question to a canonical form so trivial rewordings share an entry
+
+    Case, punctuation, spacing, Unicode compatibility forms and Arabic
+    diacritics/letter variants are all ignored.
+    """
+    text = unicodedata.normalize('NFKC', question)
+    text = ARABIC_DIACRITICS_RE.sub('', text).translate(ARABIC_LETTER_MAP).casefold()
+    return ' '.join(WORD_RE.findall(text))
+
+
+def make_cache_key(question, mode, documents):
+    """Cache key for a question against a set of documents
+
+    ``documents`` maps document name to content hash, so the key doubles as
+    a corpus version stamp: changing any selected document changes the key.
+    """
+    payload = json.dumps([normalize_question(question), mode, sorted(documents.items())], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class MemoryAnswerCache:
+    """In-process LRU cache with a time-to-live"""
+
+    def __init__(self, max_entries=1024, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created, value = entry
+            if time.time() - created > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteAnswerCache:
+    """LRU + TTL cache in a SQLite file, shared by every worker process on the host"""
+
+    def __init__(self, db_path, max_entries=1024, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS answers (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS answers_accessed ON answers (accessed)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM answers WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            with self._conn:
+                if now - row[1] > self.ttl:
+                    self._conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+                    return None
+                self._conn.execute("UPDATE answers SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now)
+            )
+            self._conn.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM answers WHERE key IN "
+                "(SELECT key FROM answers ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM answers")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+
+class NullAnswerCache:
+    """Cache that never stores anything, for ANSWER_CACHE_BACKEND=off"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def clear(self):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+def create_answer_cache(backend, db_path, max_entries, ttl):
+    """Build the answer cache selected by configuration"""
+    if backend == 'sqlite':
+        return SQLiteAnswerCache(db_path, max_entries, ttl)
+    if backend == 'off':
+        return NullAnswerCache()
+    if backend == 'memory':
+        return MemoryAnswerCache(max_entries, ttl)
+    raise ValueError(f"Unknown answer cache backend: {backend}")
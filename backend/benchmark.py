@@ -0,0 +1,328 @@
+"""Benchmark and load test for the PDF assistant backend
+
+Generates a synthetic PDF corpus, then imports the server against it with
+the offline stub model and measures:
+
+  * cold ingest (nothing cached) and warm ingest (extraction cache hits)
+  * memory held by pdf_texts and the retrieval index, and peak RSS
+  * context assembly time per question and mode
+  * /api/ask latency percentiles and throughput under concurrent load
+
+Everything runs inside a scratch directory, so no network access, API key
+or existing configuration is needed:
+
+    python benchmark.py --docs 200 --pages 20 --concurrency 32 --requests 500
+
+Use --json to get machine-readable results for comparing runs.
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+VOCABULARY = """
+orbit habitat radiation microgravity crew module oxygen water recycling plant growth
+protein muscle bone density telemetry spacecraft payload experiment sample analysis
+mission station laboratory cell culture gene expression immune response circadian
+thermal shielding dose exposure regolith lunar martian propulsion trajectory launch
+sensor calibration measurement fluid dynamics combustion material fatigue composite
+""".split()
+
+MODES = ['normal', 'analysis', 'summary']
+
+
+def pdf_escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def write_pdf(path, pages):
+    """Write a minimal text-only PDF with one page per list of lines"""
+    page_count = len(pages)
+    # Objects: 1 catalog, 2 page tree, 3 font, then a page and its content stream per page
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        ("<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            ' '.join(f"{4 + 2 * i} 0 R" for i in range(page_count)), page_count)).encode('latin-1'),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, lines in enumerate(pages):
+        content = "BT /F1 10 Tf 14 TL 50 790 Td " + ' '.join(f"({pdf_escape(line)}) ' " for line in lines) + "ET"
+        content = content.encode('latin-1')
+        objects.append(("<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                        "/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (5 + 2 * i)).encode('latin-1'))
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    with open(path, 'wb') as f:
+        f.write(out.getvalue())
+
+
+def generate_corpus(folder, docs, pages, lines_per_page=50, seed=0):
+    """Fill folder with synthetic PDFs, returning the total number of pages"""
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    for d in range(docs):
+        # Each document leans on a few topic words so retrieval has something to find
+        topic = rng.sample(VOCABULARY, 4)
+        doc_pages = []
+        for p in range(pages):
+            lines = []
+            for _ in range(lines_per_page):
+                words = [rng.choice(topic) if rng.random() < 0.3 else rng.choice(VOCABULARY) for _ in range(12)]
+                lines.append(' '.join(words))
+            lines[0] = f"Document {d} page {p + 1}: {' '.join(topic)}"
+            doc_pages.append(lines)
+        subfolder = os.path.join(folder, f"group{d % 10}")
+        os.makedirs(subfolder, exist_ok=True)
+        write_pdf(os.path.join(subfolder, f"doc{d:05d}.pdf"), doc_pages)
+    return docs * pages
+
+
+def deep_size(obj, seen=None):
+    """Approximate memory held by an object graph, following containers and __slots__"""
+    seen = set() if seen is None else seen
+    stack = [obj]
+    total = 0
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        elif isinstance(current, (str, bytes, int, float, bool, type(None))):
+            continue
+        else:
+            if hasattr(current, '__dict__'):
+                stack.append(current.__dict__)
+            for slot in getattr(type(current), '__slots__', ()):
+                if hasattr(current, slot):
+                    stack.append(getattr(current, slot))
+    return total
+
+
+def percentiles(samples, points=(50, 90, 99)):
+    """Nearest-rank percentiles of a list of numbers, in the same unit"""
+    if not samples:
+        return {f"p{p}": None for p in points}
+    ordered = sorted(samples)
+    result = {}
+    for p in points:
+        rank = min(len(ordered), max(1, math.ceil(p / 100 * len(ordered)))) - 1
+        result[f"p{p}"] = ordered[rank]
+    return result
+
+
+def summarize_ms(samples):
+    stats = {key: round(value * 1000, 2) for key, value in percentiles(samples).items() if value is not None}
+    if samples:
+        stats['mean'] = round(sum(samples) / len(samples) * 1000, 2)
+        stats['max'] = round(max(samples) * 1000, 2)
+    return stats
+
+
+def random_question(rng):
+    return f"What do the documents say about {rng.choice(VOCABULARY)} and {rng.choice(VOCABULARY)}?"
+
+
+@contextlib.contextmanager
+def quiet(enabled):
+    """Silence the server's progress output while a phase is timed"""
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    workdir = args.workdir or tempfile.mkdtemp(prefix='pdf-benchmark-')
+    corpus = os.path.join(workdir, 'corpus')
+    results = {'workdir': workdir, 'docs': args.docs, 'pages_per_doc': args.pages, 'extractor': args.extractor or 'pypdf2'}
+
+    started = time.perf_counter()
+    if not os.path.isdir(corpus):
+        generate_corpus(corpus, args.docs, args.pages, seed=args.seed)
+    results['corpus_seconds'] = round(time.perf_counter() - started, 2)
+    results['corpus_mb'] = round(sum(os.path.getsize(os.path.join(root, f))
+                                     for root, _, files in os.walk(corpus) for f in files) / 2 ** 20, 1)
+
+    # The server reads its configuration and keeps its data files in the current directory
+    os.chdir(workdir)
+    with open('config.json', 'w') as f:
+        json.dump({'pdf_folder': corpus}, f)
+    os.environ.update({
+        'MODEL_BACKEND': 'stub',
+        'STUB_MODEL_LATENCY': str(args.model_latency),
+        'WATCH_PDF_FOLDER': '0',
+        'SUMMARY_PIPELINE': '0',
+        'LOG_LEVEL': 'INFO' if args.verbose else 'WARNING',
+        'ANSWER_CACHE_BACKEND': 'off',
+        'MAX_PENDING_ASKS': str(args.max_pending),
+    })
+    if args.ingest_workers:
+        os.environ['INGEST_WORKERS'] = str(args.ingest_workers)
+    if args.extractor:
+        os.environ['PDF_EXTRACTOR'] = args.extractor
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    # Cold start: importing the server ingests the folder; without --workdir nothing is cached yet
+    started = time.perf_counter()
+    with quiet(not args.verbose):
+        import chatbot
+    results['cold_ingest_seconds'] = round(time.perf_counter() - started, 2)
+    results['pdfs_loaded'] = len(chatbot.pdf_texts)
+    results['ingest'] = chatbot.ingest_progress.snapshot()
+
+    # Warm start: the same folder again with every document served by the extraction cache
+    with chatbot.ingest_lock:
+        chatbot.pdf_texts.clear()
+        chatbot.retrieval_index.clear()
+    started = time.perf_counter()
+    with quiet(not args.verbose):
+        chatbot.sync_pdf_folder()
+    results['warm_ingest_seconds'] = round(time.perf_counter() - started, 2)
+
+    results['memory'] = {
+        'pdf_texts_mb': round(deep_size(chatbot.pdf_texts) / 2 ** 20, 2),
+        'retrieval_index_mb': round(deep_size(chatbot.retrieval_index) / 2 ** 20, 2),
+        'document_store_mb': round(chatbot.document_store.size(chatbot.extraction_cache.generation()) / 2 ** 20, 2),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+    names = list(chatbot.pdf_texts)
+    if not names:
+        raise SystemExit("No PDFs were loaded; nothing to benchmark")
+
+    def pick_documents():
+        # Half the questions cover everything, the rest a handful of documents
+        if rng.random() < 0.5:
+            return []
+        return rng.sample(names, min(len(names), rng.randint(1, 5)))
+
+    context = {}
+    with quiet(not args.verbose):
+        for mode in MODES:
+            samples = []
+            for _ in range(args.context_samples):
+                question = random_question(rng)
+                pdfs_to_use = pick_documents() or names
+                started = time.perf_counter()
+                chatbot.build_context(question, pdfs_to_use, mode)
+                samples.append(time.perf_counter() - started)
+            context[mode] = summarize_ms(samples)
+    results['context_ms'] = context
+
+    payloads = [{'question': random_question(rng) + f" #{i}", 'mode': rng.choice(MODES),
+                 'selected_pdfs': pick_documents()} for i in range(args.requests)]
+
+    def ask(payload):
+        client = chatbot.app.test_client()
+        started = time.perf_counter()
+        response = client.post('/api/ask', json=payload)
+        return response.status_code, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with quiet(not args.verbose), ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        outcomes = list(pool.map(ask, payloads))
+    elapsed = time.perf_counter() - started
+
+    ok = [latency for status, latency in outcomes if status == 200]
+    statuses = {}
+    for status, _ in outcomes:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    results['ask'] = {
+        'concurrency': args.concurrency,
+        'requests': args.requests,
+        'model_latency_ms': round(args.model_latency * 1000, 1),
+        'statuses': statuses,
+        'throughput_rps': round(len(ok) / elapsed, 2) if elapsed else None,
+        'latency_ms': summarize_ms(ok),
+        'model_calls': chatbot.model.calls,
+    }
+    results['memory']['peak_rss_mb'] = peak_rss_mb()
+    return results
+
+
+def print_report(results):
+    print(f"Corpus: {results['docs']} PDFs x {results['pages_per_doc']} pages "
+          f"({results['corpus_mb']} MB) in {results['workdir']}")
+    print(f"Cold ingest:  {results['cold_ingest_seconds']} s "
+          f"({results['ingest']['files_per_sec']} files/s, {results['ingest']['pages_per_sec']} pages/s, "
+          f"{results['ingest']['failed']} failed)")
+    print(f"Warm ingest:  {results['warm_ingest_seconds']} s for {results['pdfs_loaded']} PDFs")
+    memory = results['memory']
+    print(f"Memory:       pdf_texts {memory['pdf_texts_mb']} MB, retrieval index {memory['retrieval_index_mb']} MB, "
+          f"document store {memory['document_store_mb']} MB on disk, peak RSS {memory['peak_rss_mb']} MB")
+    for mode, stats in results['context_ms'].items():
+        print(f"Context {mode + ':':<9} p50 {stats['p50']} ms, p90 {stats['p90']} ms, p99 {stats['p99']} ms")
+    ask = results['ask']
+    latency = ask['latency_ms']
+    print(f"/api/ask:     {ask['requests']} requests at concurrency {ask['concurrency']} "
+          f"(model latency {ask['model_latency_ms']} ms), statuses {ask['statuses']}")
+    if latency:
+        print(f"              {ask['throughput_rps']} req/s, p50 {latency['p50']} ms, p90 {latency['p90']} ms, "
+              f"p99 {latency['p99']} ms, max {latency['max']} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--docs', type=int, default=50, help='number of synthetic PDFs')
+    parser.add_argument('--pages', type=int, default=10, help='pages per PDF')
+    parser.add_argument('--requests', type=int, default=200, help='/api/ask requests in the load test')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent /api/ask clients')
+    parser.add_argument('--model-latency', type=float, default=0.2, help='stub model latency in seconds')
+    parser.add_argument('--max-pending', type=int, default=64, help='MAX_PENDING_ASKS for the server')
+    parser.add_argument('--ingest-workers', type=int, default=0, help='INGEST_WORKERS (default: CPU count)')
+    parser.add_argument('--extractor', help='PDF_EXTRACTOR (pypdf2, pymupdf, pypdfium2 or auto)')
+    parser.add_argument('--context-samples', type=int, default=100, help='build_context calls per mode')
+    parser.add_argument('--workdir', help='reuse a directory (corpus and caches) instead of a fresh one')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--verbose', action='store_true', help="show the server's own output")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+
+
+if __name__ == '__main__':
+    main()
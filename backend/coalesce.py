@@ -0,0 +1,130 @@
+import threading
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self, timeout=None):
+        if not self.event.wait(timeout):
+            raise TimeoutError("Timed out waiting for an identical in-flight request")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    """Collapse concurrent work with the same key into a single call
+
+    The first caller for a key becomes the leader and does the work; callers
+    arriving while it runs wait for the leader's result instead of repeating
+    the work themselves.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def join(self, key):
+        """Return (call, is_leader); the leader must eventually call finish()"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                return call, False
+            call = self._calls[key] = _Call()
+            return call, True
+
+    def finish(self, key, call, result=None, error=None):
+        """Publish the leader's outcome; later calls for the same call are ignored"""
+        with self._lock:
+            if call.event.is_set():
+                return
+            if self._calls.get(key) is call:
+                del self._calls[key]
+            call.result = result
+            call.error = error
+            call.event.set()
+
+    def do(self, key, fn, timeout=None):
+        """Run fn once per key among concurrent callers, returning (result, shared)"""
+        call, leader = self.join(key)
+        if not leader:
+            return call.wait(timeout), True
+        try:
+            result = fn()
+        except Exception as e:
+            self.finish(key, call, error=e)
+            raise
+        self.finish(key, call, result=result)
+        return result, False
+
+    def __len__(self):
+        return len(self._calls)
+
+
+class _Batch:
+    __slots__ = ('items', 'results', 'event', 'error')
+
+    def __init__(self):
+        self.items = []
+        self.results = None
+        self.event = threading.Event()
+        self.error = None
+
+
+class MicroBatcher:
+    """Group compatible requests that arrive within a short window
+
+    ``run_batch(group_key, items)`` is called once per window with every item
+    submitted under the same group key, and must return one result per item
+    (an Exception instance fails just that item).
+    """
+
+    def __init__(self, run_batch, window=0.05, max_batch=8):
+        self.run_batch = run_batch
+        self.window = window
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._open = {}
+
+    def submit(self, group_key, item, timeout=None):
+        """Add an item to the group's current batch and block until it is answered"""
+        flush_now = False
+        with self._lock:
+            batch = self._open.get(group_key)
+            if batch is None:
+                batch = self._open[group_key] = _Batch()
+                timer = threading.Timer(self.window, self._flush, args=(group_key, batch))
+                timer.daemon = True
+                timer.start()
+            index = len(batch.items)
+            batch.items.append(item)
+            if len(batch.items) >= self.max_batch:
+                flush_now = True
+
+        if flush_now:
+            self._flush(group_key, batch)
+        if not batch.event.wait(timeout):
+            raise TimeoutError("Timed out waiting for a batched request")
+        if batch.error is not None:
+            raise batch.error
+        result = batch.results[index]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _flush(self, group_key, batch):
+        with self._lock:
+            if self._open.get(group_key) is not batch:
+                return  # Already flushed by the other trigger
+            del self._open[group_key]
+        try:
+            batch.results = self.run_batch(group_key, batch.items)
+        except Exception as e:
+            batch.error = e
+        finally:
+            batch.event.set()
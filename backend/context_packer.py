@@ -0,0 +1,193 @@
+import bisect
+import math
+import re
+
+# Characters per token, calibrated against SentencePiece-style vocabularies
+# like Gemini's: English words split into ~4 character pieces, Arabic words
+# into much shorter ones, digits into small groups, and every other visible
+# character (punctuation, symbols, CJK) costs about a token of its own.
+LATIN_CHARS_PER_TOKEN = 4.0
+ARABIC_CHARS_PER_TOKEN = 2.5
+DIGITS_PER_TOKEN = 3.0
+
+# Indexed by the TOKEN_PIECE_RE group that matched
+CHARS_PER_TOKEN = {1: ARABIC_CHARS_PER_TOKEN, 2: LATIN_CHARS_PER_TOKEN, 3: DIGITS_PER_TOKEN}
+
+TOKEN_PIECE_RE = re.compile(
+    r'([\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF]+)'
+    r'|([^\W\d_]+)'
+    r'|(\d+)'
+    r'|\S'
+)
+
+SENTENCE_END_RE = re.compile(r'[.!?\u061F\u06D4\u3002](?=\s)|\n\s*\n')
+
+# Passages that would be cut below this many tokens are dropped instead
+MIN_PASSAGE_TOKENS = 40
+
+
+def _pieces(text):
+    """Yield (end position, token cost) for each piece of text"""
+    for match in TOKEN_PIECE_RE.finditer(text):
+        group = match.lastindex
+        if group:
+            cost = (match.end() - match.start()) / CHARS_PER_TOKEN[group]
+            yield match.end(), cost if cost > 1.0 else 1.0
+        else:
+            yield match.end(), 1.0
+
+
+def estimate_tokens(text):
+    """Estimate how many model tokens text costs, by script"""
+    return math.ceil(sum(cost for _, cost in _pieces(text)))
+
+
+def trim_to_tokens(text, max_tokens):
+    """Longest prefix of text within max_tokens, cut after a sentence or at least a word
+
+    Returns (prefix, estimated tokens of the prefix).
+    """
+    ends = [0]
+    totals = [0.0]
+    total = 0.0
+    for end, cost in _pieces(text):
+        total += cost
+        if total > max_tokens:
+            break
+        ends.append(end)
+        totals.append(total)
+    else:
+        return text, math.ceil(total)
+
+    limit = ends[-1]
+    sentence_ends = [m.end() for m in SENTENCE_END_RE.finditer(text, 0, limit)]
+    # Prefer a sentence boundary unless that would give up more than half the allowance
+    if sentence_ends and sentence_ends[-1] >= limit // 2:
+        limit = sentence_ends[-1]
+    return text[:limit].rstrip(), math.ceil(totals[bisect.bisect_right(ends, limit) - 1])
+
+
+def apportion(demands, budget):
+    """Split budget across keys fairly: nobody gets more than it asks for, and
+    what small demands leave unused is shared among the larger ones"""
+    shares = {}
+    remaining = budget
+    ordered = sorted(demands.items(), key=lambda item: item[1])
+    for position, (key, demand) in enumerate(ordered):
+        fair = remaining // (len(ordered) - position)
+        shares[key] = min(demand, fair)
+        remaining -= shares[key]
+    return shares
+
+
+class Passage:
+    """A piece of a document's text; ``position`` orders passages for reading
+
+    ``rank`` marks passages that matched the question (0 is the best match);
+    passages without one only fill whatever budget the ranked ones leave.
+    Pass ``text_tokens`` when the estimate is already known, to skip re-estimating.
+    """
+    __slots__ = ('position', 'label', 'text', 'tokens', 'rank')
+
+    def __init__(self, position, label, text, text_tokens=None, rank=None):
+        self.position = position
+        self.label = label
+        self.text = text
+        self.rank = rank
+        if text_tokens is None:
+            text_tokens = estimate_tokens(text)
+        self.tokens = text_tokens + (estimate_tokens(label) if label else 0)
+
+
+class PackedContext:
+    __slots__ = ('text', 'sources', 'tokens', 'budget')
+
+    def __init__(self, text, sources, tokens, budget):
+        self.text = text
+        self.sources = sources
+        self.tokens = tokens
+        self.budget = budget
+
+
+def _fit(passage, allowance):
+    """(label, text, tokens) of the passage cut to fit allowance, or None if too little would be left"""
+    if passage.tokens <= allowance:
+        return passage.label, passage.text, passage.tokens
+    label_tokens = estimate_tokens(passage.label) if passage.label else 0
+    if allowance - label_tokens < MIN_PASSAGE_TOKENS:
+        return None
+    cut, cut_tokens = trim_to_tokens(passage.text, allowance - label_tokens)
+    if not cut:
+        return None
+    return passage.label, cut, label_tokens + cut_tokens
+
+
+def pack_context(documents, budget):
+    """Fill a token budget with passages from several documents
+
+    ``documents`` is a list of (name, header, passages), most relevant
+    document first, with each document's passages best first. Ranked
+    passages are taken first, in rank order. The rest of the budget is then
+    split fairly across documents in the order given, and documents whose
+    share could not hold a useful passage are dropped from the end, so a
+    large selection loses its least relevant documents rather than all of
+    them. A passage that does not fit is cut at a sentence boundary.
+    Passages are laid out in reading order, and the documents in the order
+    given.
+    """
+    headers = {name: estimate_tokens(header) for name, header, _ in documents}
+    chosen = {}
+    left = budget
+
+    ranked = sorted(((p.rank, name, p) for name, _, passages in documents for p in passages if p.rank is not None),
+                    key=lambda item: item[0])
+    for _, name, passage in ranked:
+        header_tokens = 0 if name in chosen else headers[name]
+        fitted = _fit(passage, left - header_tokens)
+        if fitted is None:
+            continue
+        chosen.setdefault(name, []).append((passage.position,) + fitted[:2])
+        left -= header_tokens + fitted[2]
+
+    # Admit documents in order while each can still get a minimal passage, then share fairly
+    fillers = []
+    reserved = 0
+    for name, _, passages in documents:
+        rest = [p for p in passages if p.rank is None]
+        if not rest:
+            continue
+        header_tokens = 0 if name in chosen else headers[name]
+        floor = header_tokens + min(rest[0].tokens, MIN_PASSAGE_TOKENS + 10)
+        if reserved + floor > left:
+            break
+        reserved += floor
+        fillers.append((name, header_tokens, rest))
+    demands = {name: header_tokens + sum(p.tokens for p in rest) for name, header_tokens, rest in fillers}
+    shares = apportion(demands, left)
+
+    for name, header_tokens, rest in fillers:
+        allowance = shares[name] - header_tokens
+        taken = []
+        for passage in rest:
+            fitted = _fit(passage, allowance)
+            if fitted is None:
+                continue
+            taken.append((passage.position,) + fitted[:2])
+            allowance -= fitted[2]
+        if taken:
+            chosen.setdefault(name, []).extend(taken)
+            left -= shares[name] - allowance
+
+    sections = []
+    sources = []
+    for name, header, _ in documents:
+        if name not in chosen:
+            continue
+        section = header
+        for _, label, text in sorted(chosen[name], key=lambda item: item[0]):
+            section += f"\n{label}\n{text}" if label else f"\n{text}"
+        sections.append(section)
+        sources.append(name)
+
+    text = ''.join(f"\n\n{section}" for section in sections)
+    return PackedContext(text, sources, budget - left, budget)
@@ -0,0 +1,140 @@
+import glob
+import mmap
+import os
+import threading
+
+
+def utf8_offsets(text, positions):
+    """Map character positions in text to UTF-8 byte positions in one pass"""
+    offsets = {}
+    prev = 0
+    byte_pos = 0
+    for pos in sorted(set(positions)):
+        byte_pos += len(text[prev:pos].encode('utf-8'))
+        offsets[pos] = byte_pos
+        prev = pos
+    return offsets
+
+
+class DocumentStore:
+    """Append-only files of extracted UTF-8 text, read through shared mmaps
+
+    Documents are addressed by (generation, offset, length) in bytes. Every
+    worker process maps the same files, so the text lives once in the OS
+    page cache instead of once per process, and only the pages actually
+    read are faulted in. Compaction copies the text still in use into the
+    next generation's file; generation 0 is ``path`` itself and generation
+    N is ``path`` with ``.N`` before the extension.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._maps = {}
+        open(path, 'ab').close()
+
+    def path_for(self, generation):
+        if not generation:
+            return self.path
+        root, ext = os.path.splitext(self.path)
+        return f"{root}.{generation}{ext}"
+
+    def generations(self):
+        """Generations that have a file on disk"""
+        root, ext = os.path.splitext(self.path)
+        found = {0} if os.path.exists(self.path) else set()
+        for path in glob.glob(f"{glob.escape(root)}.*{ext}"):
+            suffix = path[len(root) + 1:len(path) - len(ext)]
+            if suffix.isdigit():
+                found.add(int(suffix))
+        return sorted(found)
+
+    def size(self, generation=0):
+        try:
+            return os.path.getsize(self.path_for(generation))
+        except FileNotFoundError:
+            return 0
+
+    def append(self, data, generation=0):
+        """Append bytes, returning the offset they were written at"""
+        with self._lock:
+            fd = os.open(self.path_for(generation), os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, 'O_BINARY', 0))
+            try:
+                view = memoryview(data)
+                while view:
+                    written = os.write(fd, view)
+                    view = view[written:]
+                # With O_APPEND the descriptor ends right after our own write,
+                # even if another process appended concurrently
+                end = os.lseek(fd, 0, os.SEEK_CUR)
+            finally:
+                os.close(fd)
+            return end - len(data)
+
+    def read_bytes(self, offset, length, generation=0):
+        if length <= 0:
+            return b''
+        current = self._maps.get(generation)
+        if current is None or offset + length > len(current):
+            current = self._remap(generation)
+        if offset + length > len(current):
+            raise ValueError(f"Range {offset}+{length} is past the end of {self.path_for(generation)}")
+        return current[offset:offset + length]
+
+    def read(self, offset, length, generation=0):
+        """Read a range of text; cut points are expected to fall on character boundaries"""
+        return self.read_bytes(offset, length, generation).decode('utf-8', errors='replace')
+
+    def write_generation(self, generation, ranges):
+        """Write (generation, offset, length) ranges back to back as a new generation, returning their offsets"""
+        offsets = []
+        position = 0
+        with open(self.path_for(generation), 'wb') as f:
+            for source, offset, length in ranges:
+                f.write(self.read_bytes(offset, length, source))
+                offsets.append(position)
+                position += length
+            f.flush()
+            os.fsync(f.fileno())
+        return offsets
+
+    def release(self, keep_generations):
+        """Drop the maps of generations this process no longer reads"""
+        with self._lock:
+            for generation in list(self._maps):
+                if generation not in keep_generations:
+                    del self._maps[generation]
+
+    def remove(self, generation):
+        """Delete a compacted generation's file, returning False if it is still mapped (Windows)"""
+        with self._lock:
+            self._maps.pop(generation, None)
+            try:
+                os.remove(self.path_for(generation))
+            except FileNotFoundError:
+                pass
+            except OSError:
+                return False
+            return True
+
+    def truncate(self):
+        """Discard all stored text (only when nothing references it any more)"""
+        for generation in self.generations():
+            if generation:
+                self.remove(generation)
+        with self._lock:
+            self._maps.clear()
+            open(self.path, 'wb').close()
+
+    def _remap(self, generation):
+        with self._lock:
+            path = self.path_for(generation)
+            size = os.path.getsize(path)
+            current = self._maps.get(generation)
+            if current is None or len(current) < size:
+                # The old map is not closed: a reader may still be slicing it, and
+                # it is unmapped once the last reference to it is dropped
+                with open(path, 'rb') as f:
+                    current = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) if size else b''
+                self._maps[generation] = current
+            return current
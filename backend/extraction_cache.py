@@ -0,0 +1,306 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+from document_store import utf8_offsets
+
+SCHEMA_VERSION = 4
+
+COLUMNS = "sha256, pages, chars, data_generation, data_offset, data_length, page_offsets"
+
+# The document store is compacted once at least this much of it, and at least
+# as much as is still in use, is text that no cached extraction refers to
+COMPACT_MIN_DEAD_BYTES = 16 * 1024 * 1024
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Hash a file's contents without reading it into memory at once"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _record(row):
+    sha256, pages, chars, generation, offset, length, page_offsets = row
+    return {
+        'sha256': sha256,
+        'pages': pages,
+        'chars': chars,
+        'generation': generation,
+        'offset': offset,
+        'length': length,
+        'page_offsets': json.loads(page_offsets)
+    }
+
+
+class ExtractionCache:
+    """Persistent index of extracted PDF text keyed by path, size, mtime and hash
+
+    The text itself lives in a DocumentStore; rows only record where it is.
+    Text from a different extractor is not interchangeable, so switching
+    extractors starts the cache over.
+    A file whose size and mtime are unchanged is served straight from the
+    cache. If either changed, the content hash decides: a touched but
+    identical file is still a hit, anything else has to be re-extracted.
+
+    Lookups return a record with the content hash, page count, character
+    count, the (generation, offset, length) of the text in the document
+    store and the byte offset of each page relative to the start of the
+    document. ``compact()`` moves text to a new generation, so processes
+    holding records re-read their locations when ``generation()`` changes.
+
+    Files that could not be extracted are remembered by size and mtime too,
+    so a broken PDF is only retried once it changes.
+    """
+
+    def __init__(self, db_path, document_store, extractor='pypdf2'):
+        self.db_path = db_path
+        self.document_store = document_store
+        self.extractor = extractor
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._init_schema()
+
+    def _init_schema(self):
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                # Cached rows are only derived data, so a format change just starts over
+                self._conn.execute("DROP TABLE IF EXISTS extractions")
+                self._conn.execute("DROP TABLE IF EXISTS failures")
+                self._conn.execute("DELETE FROM settings WHERE key = 'store_generation'")
+                self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                self.document_store.truncate()
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS extractions (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    pages INTEGER NOT NULL,
+                    chars INTEGER NOT NULL,
+                    data_generation INTEGER NOT NULL,
+                    data_offset INTEGER NOT NULL,
+                    data_length INTEGER NOT NULL,
+                    page_offsets TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS extractions_sha256 ON extractions (sha256)")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS extractions_location ON extractions (data_generation, data_offset)"
+            )
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS failures (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    error TEXT NOT NULL
+                )
+            """)
+            row = self._conn.execute("SELECT value FROM settings WHERE key = 'extractor'").fetchone()
+            if row and row[0] != self.extractor:
+                self._conn.execute("DELETE FROM extractions")
+                self._conn.execute("DELETE FROM failures")
+                self._conn.execute("DELETE FROM settings WHERE key = 'store_generation'")
+                self.document_store.truncate()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO settings (key, value) VALUES ('extractor', ?)", (self.extractor,)
+            )
+
+    def folder_version(self):
+        """Counter bumped whenever a process changes the folder or the PDFs loaded from it"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM settings WHERE key = 'folder_version'").fetchone()
+        return int(row[0]) if row else 0
+
+    def bump_folder_version(self):
+        """Tell the other processes on the host to resync, returning the new version"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO settings (key, value) VALUES ('folder_version', '1') "
+                "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+            )
+            return int(self._conn.execute("SELECT value FROM settings WHERE key = 'folder_version'").fetchone()[0])
+
+    def lookup(self, pdf_path, stat=None):
+        """Return (record, sha256) for an unchanged file, or (None, sha256)
+
+        The content hash is returned either way, so a miss can be stored
+        without hashing the file a second time.
+        """
+        path = str(pdf_path)
+        stat = stat or os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT size, mtime_ns, {COLUMNS} FROM extractions WHERE path = ?",
+                (path,)
+            ).fetchone()
+        record = _record(row[2:]) if row else None
+        if record and not self._in_store(record):
+            record = None
+
+        if record and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return record, record['sha256']
+
+        sha256 = file_sha256(path)
+        if record and record['sha256'] == sha256:
+            # Same content with a new timestamp (copied, touched, restored from backup)
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "UPDATE extractions SET size = ?, mtime_ns = ? WHERE path = ?",
+                    (stat.st_size, stat.st_mtime_ns, path)
+                )
+            return record, sha256
+
+        # A renamed or copied file is already cached under its old path
+        with self._lock:
+            twin = self._conn.execute(
+                f"SELECT {COLUMNS} FROM extractions WHERE sha256 = ? LIMIT 1",
+                (sha256,)
+            ).fetchone()
+        if twin and self._in_store(_record(twin)):
+            record = _record(twin)
+            self._save(path, stat, record)
+            return record, sha256
+
+        return None, sha256
+
+    def store(self, pdf_path, text, pages, page_offsets, sha256=None, stat=None):
+        """Save a fresh extraction, returning its record
+
+        ``page_offsets`` are character offsets into ``text``; the record keeps
+        byte offsets so pages can be sliced straight out of the store.
+        """
+        path = str(pdf_path)
+        stat = stat or os.stat(path)
+        data = text.encode('utf-8')
+        byte_offsets = utf8_offsets(text, page_offsets)
+        generation = self.generation()
+        record = {
+            'sha256': sha256 or file_sha256(path),
+            'pages': pages,
+            'chars': len(text),
+            'generation': generation,
+            'offset': self.document_store.append(data, generation),
+            'length': len(data),
+            'page_offsets': [byte_offsets[p] for p in page_offsets]
+        }
+        self._save(path, stat, record)
+        return record
+
+    def record_failure(self, pdf_path, stat, error):
+        """Remember that this version of a file could not be extracted"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO failures (path, size, mtime_ns, error) VALUES (?, ?, ?, ?)",
+                (str(pdf_path), stat.st_size, stat.st_mtime_ns, error)
+            )
+
+    def failed(self, pdf_path, stat):
+        """The error this exact version of a file failed with before, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, error FROM failures WHERE path = ?", (str(pdf_path),)
+            ).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+        return None
+
+    def _save(self, path, stat, record):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM failures WHERE path = ?", (path,))
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO extractions (path, size, mtime_ns, {COLUMNS}) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, record['sha256'], record['pages'], record['chars'],
+                 record['generation'], record['offset'], record['length'], json.dumps(record['page_offsets']))
+            )
+
+    def _in_store(self, record):
+        # Guards against a document store that was deleted or replaced under us
+        return record['offset'] + record['length'] <= self.document_store.size(record['generation'])
+
+    def generation(self):
+        """Document store generation new text is appended to"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM settings WHERE key = 'store_generation'").fetchone()
+        return int(row[0]) if row else 0
+
+    def locations(self):
+        """{path: (sha256, generation, offset, length)} of every cached extraction"""
+        with self._lock:
+            return {row[0]: row[1:] for row in self._conn.execute(
+                "SELECT path, sha256, data_generation, data_offset, data_length FROM extractions"
+            )}
+
+    def compact(self, min_dead_bytes=COMPACT_MIN_DEAD_BYTES):
+        """Copy the text still referenced into a new store generation once enough of the store is dead
+
+        Returns the new generation, or None if compaction was not worth it.
+        Rows written while the copy runs keep their old location. The
+        previous generation stays on disk until the next compaction, for
+        processes that have not yet switched to the new one.
+        """
+        with self._lock:
+            ranges = self._conn.execute(
+                "SELECT DISTINCT data_generation, data_offset, data_length FROM extractions "
+                "ORDER BY data_generation, data_offset"
+            ).fetchall()
+        sizes = {g: self.document_store.size(g) for g in {r[0] for r in ranges}}
+        ranges = [r for r in ranges if r[1] + r[2] <= sizes[r[0]]]
+        current = self.generation()
+        live = sum(length for _, _, length in ranges)
+        total = sum(sizes.values()) + (0 if current in sizes else self.document_store.size(current))
+        dead = total - live
+        if dead < min_dead_bytes or dead < live:
+            return None
+
+        generation = max(self.document_store.generations() + [current]) + 1
+        offsets = self.document_store.write_generation(generation, ranges)
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute("SELECT value FROM settings WHERE key = 'store_generation'").fetchone()
+            if (int(row[0]) if row else 0) != current:
+                # Another process compacted first; its copy wins
+                self._conn.rollback()
+                self.document_store.remove(generation)
+                return None
+            self._conn.executemany(
+                "UPDATE extractions SET data_generation = ?, data_offset = ? "
+                "WHERE data_generation = ? AND data_offset = ? AND data_length = ?",
+                [(generation, offset, *r) for offset, r in zip(offsets, ranges)]
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO settings (key, value) VALUES ('store_generation', ?)", (str(generation),)
+            )
+            in_use = {r[0] for r in self._conn.execute("SELECT DISTINCT data_generation FROM extractions")}
+        for old in self.document_store.generations():
+            if old < current and old not in in_use:
+                self.document_store.remove(old)
+        return generation
+
+    def sha256s(self):
+        """Content hashes of every cached extraction"""
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT DISTINCT sha256 FROM extractions")}
+
+    def prune(self, keep_paths):
+        """Drop entries and failures for files that no longer exist under the scanned folder"""
+        keep = {str(p) for p in keep_paths}
+        with self._lock:
+            cached = [r[0] for r in self._conn.execute("SELECT path FROM extractions")]
+            failed = [r[0] for r in self._conn.execute("SELECT path FROM failures")]
+        stale = [p for p in cached if p not in keep and not os.path.exists(p)]
+        gone = [(p,) for p in failed if p not in keep and not os.path.exists(p)]
+        if stale or gone:
+            with self._lock, self._conn:
+                self._conn.executemany("DELETE FROM extractions WHERE path = ?", [(p,) for p in stale])
+                self._conn.executemany("DELETE FROM failures WHERE path = ?", gone)
+        return len(stale)
@@ -0,0 +1,131 @@
+import logging
+import os
+import threading
+import time
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # watchdog is optional; fall back to polling
+    FileSystemEventHandler = object
+    Observer = None
+
+logger = logging.getLogger(__name__)
+
+
+def is_pdf(path):
+    """Same rule as the folder scan's ``**/*.pdf`` glob"""
+    return str(path).endswith('.pdf')
+
+
+def snapshot_folder(folder):
+    """Map every PDF under folder to its (size, mtime_ns)"""
+    snapshot = {}
+    for root, _, files in os.walk(folder):
+        for name in files:
+            if is_pdf(name):
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.event_type not in ('created', 'modified', 'deleted', 'moved'):
+            return
+        paths = [event.src_path]
+        if event.event_type == 'moved':
+            paths.append(event.dest_path)
+        for path in paths:
+            # Directory moves and deletes arrive as a single event for the directory
+            if event.is_directory and event.event_type in ('deleted', 'moved'):
+                self.watcher.notify(path)
+            elif not event.is_directory and is_pdf(path):
+                self.watcher.notify(path)
+
+
+class FolderWatcher:
+    """Reports added, modified, deleted and renamed PDFs under a folder
+
+    Uses inotify (or the platform equivalent) through watchdog when it is
+    installed, and otherwise polls the folder every ``poll_interval`` seconds.
+    Paths are handed to ``on_change`` in batches once they have been quiet
+    for ``debounce`` seconds, so files still being copied are not parsed
+    half-written.
+    """
+
+    def __init__(self, folder, on_change, poll_interval=2.0, debounce=1.0):
+        self.folder = str(folder)
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.mode = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self._observer = None
+
+    def notify(self, path):
+        with self._lock:
+            self._pending[str(path)] = time.monotonic()
+
+    def start(self):
+        if Observer is not None:
+            try:
+                self._observer = Observer()
+                self._observer.schedule(_EventHandler(self), self.folder, recursive=True)
+                self._observer.start()
+                self.mode = 'events'
+            except Exception as e:
+                logger.warning("Native folder watching unavailable (%s), falling back to polling", e)
+                self._observer = None
+        if self._observer is None:
+            self.mode = 'polling'
+            self._spawn(self._poll_loop)
+        self._spawn(self._dispatch_loop)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        for thread in self._threads:
+            thread.join()
+
+    def _spawn(self, target):
+        thread = threading.Thread(target=target, name=f"folder-watcher-{target.__name__}", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _poll_loop(self):
+        previous = snapshot_folder(self.folder)
+        while not self._stop.wait(self.poll_interval):
+            current = snapshot_folder(self.folder)
+            for path in previous.keys() - current.keys():
+                self.notify(path)
+            for path, signature in current.items():
+                if previous.get(path) != signature:
+                    self.notify(path)
+            previous = current
+
+    def _dispatch_loop(self):
+        while not self._stop.wait(0.25):
+            now = time.monotonic()
+            with self._lock:
+                ready = [p for p, seen in self._pending.items() if now - seen >= self.debounce]
+                for path in ready:
+                    del self._pending[path]
+            if ready:
+                try:
+                    self.on_change(ready)
+                except Exception:
+                    logger.exception("Error applying folder changes")
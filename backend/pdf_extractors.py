@@ -0,0 +1,155 @@
+import PyPDF2
+
+# Faster native extractors are optional; PyPDF2 is always available
+try:
+    import pymupdf
+except ImportError:
+    try:
+        import fitz as pymupdf  # Older PyMuPDF releases only ship the fitz name
+    except ImportError:
+        pymupdf = None
+
+try:
+    import pypdfium2
+except ImportError:
+    pypdfium2 = None
+
+
+class PageExtractor:
+    """Reads a PDF page by page
+
+    Subclasses open a document and extract one page's text at a time, so a
+    page that fails to parse only costs that page, and a large file can be
+    split into page ranges handled by different workers.
+    """
+
+    name = None
+
+    def _open(self, pdf_path):
+        raise NotImplementedError
+
+    def _page_count(self, document):
+        raise NotImplementedError
+
+    def _page_text(self, document, index):
+        raise NotImplementedError
+
+    def _close(self, document):
+        pass
+
+    def page_count(self, pdf_path):
+        document = self._open(pdf_path)
+        try:
+            return self._page_count(document)
+        finally:
+            self._close(document)
+
+    def iter_pages(self, pdf_path, start=0, stop=None):
+        """Yield (page index, text, error) for pages [start, stop); error is None on success
+
+        Failing to open the file raises; a failing page yields empty text and
+        the error message instead.
+        """
+        document = self._open(pdf_path)
+        try:
+            count = self._page_count(document)
+            stop = count if stop is None else min(stop, count)
+            for index in range(start, stop):
+                try:
+                    yield index, self._page_text(document, index) or '', None
+                except Exception as e:
+                    yield index, '', str(e) or type(e).__name__
+        finally:
+            self._close(document)
+
+
+class PyPDF2Extractor(PageExtractor):
+    name = 'pypdf2'
+
+    def _open(self, pdf_path):
+        file = open(pdf_path, 'rb')
+        try:
+            return file, PyPDF2.PdfReader(file)
+        except BaseException:
+            file.close()
+            raise
+
+    def _page_count(self, document):
+        return len(document[1].pages)
+
+    def _page_text(self, document, index):
+        return document[1].pages[index].extract_text()
+
+    def _close(self, document):
+        document[0].close()
+
+
+class PyMuPDFExtractor(PageExtractor):
+    name = 'pymupdf'
+
+    def _open(self, pdf_path):
+        return pymupdf.open(pdf_path)
+
+    def _page_count(self, document):
+        return document.page_count
+
+    def _page_text(self, document, index):
+        return document.load_page(index).get_text()
+
+    def _close(self, document):
+        document.close()
+
+
+class PdfiumExtractor(PageExtractor):
+    name = 'pypdfium2'
+
+    def _open(self, pdf_path):
+        return pypdfium2.PdfDocument(pdf_path)
+
+    def _page_count(self, document):
+        return len(document)
+
+    def _page_text(self, document, index):
+        page = document[index]
+        try:
+            text_page = page.get_textpage()
+            try:
+                return text_page.get_text_range()
+            finally:
+                text_page.close()
+        finally:
+            page.close()
+
+    def _close(self, document):
+        document.close()
+
+
+EXTRACTORS = {
+    'pypdf2': (PyPDF2Extractor, True),
+    'pymupdf': (PyMuPDFExtractor, pymupdf is not None),
+    'pypdfium2': (PdfiumExtractor, pypdfium2 is not None),
+}
+
+# 'auto' picks the first installed one
+AUTO_ORDER = ('pymupdf', 'pypdfium2', 'pypdf2')
+
+
+def available_extractors():
+    """Names of the extractors that are installed"""
+    return [name for name, (_, installed) in EXTRACTORS.items() if installed]
+
+
+def resolve_extractor_name(name):
+    """Map a configured extractor name (or 'auto') to an installed extractor's name"""
+    name = (name or 'pypdf2').lower()
+    if name == 'auto':
+        return next(n for n in AUTO_ORDER if EXTRACTORS[n][1])
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown PDF extractor: {name} (choose auto, {', '.join(EXTRACTORS)})")
+    if not EXTRACTORS[name][1]:
+        raise ValueError(f"PDF extractor {name} is not installed (installed: {', '.join(available_extractors())})")
+    return name
+
+
+def get_extractor(name=None):
+    return EXTRACTORS[resolve_extractor_name(name)][0]()
@@ -0,0 +1,386 @@
+import logging
+import os
+import pickle
+import queue
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+from pdf_extractors import PageExtractor, get_extractor, resolve_extractor_name
+
+logger = logging.getLogger(__name__)
+
+# Files at least this large are checked for page count and may be split across workers
+LARGE_PDF_BYTES = 8 * 1024 * 1024
+
+# Worker processes left unused this long are shut down
+IDLE_WORKER_SECONDS = 300
+
+
+def read_pdf(pdf_path, extractor=None, start=0, stop=None):
+    """Extract text from a PDF file, raising on failure
+
+    Returns (text, pages, page_offsets) where page_offsets[i] is the
+    character offset at which page start + i + 1 starts in text. Pages that
+    fail to parse are kept as empty pages so page numbers stay aligned; the
+    file only fails if every page does.
+    """
+    extractor = extractor if isinstance(extractor, PageExtractor) else get_extractor(extractor)
+    parts = []
+    page_offsets = []
+    position = 0
+    errors = []
+    for index, page_text, error in extractor.iter_pages(pdf_path, start, stop):
+        if error:
+            errors.append((index, error))
+        page_offsets.append(position)
+        parts.append(page_text + "\n")
+        position += len(parts[-1])
+
+    if errors and len(errors) == len(parts):
+        raise ValueError(f"no page could be read (page {errors[0][0] + 1}: {errors[0][1]})")
+    for index, error in errors[:5]:
+        logger.warning("Skipped page %d of %s: %s", index + 1, pdf_path, error)
+    if len(errors) > 5:
+        logger.warning("Skipped %d more page(s) of %s", len(errors) - 5, pdf_path)
+    return ''.join(parts), len(parts), page_offsets
+
+
+def _merge_parts(parts):
+    """Join page-range results of one file back into (text, pages, page_offsets)"""
+    texts = []
+    page_offsets = []
+    position = 0
+    for text, pages, offsets in parts:
+        page_offsets.extend(position + offset for offset in offsets)
+        texts.append(text)
+        position += len(text)
+    return ''.join(texts), sum(part[1] for part in parts), page_offsets
+
+
+def _extract_task(pdf_path, extractor, start=0, stop=None, split=0):
+    """Worker task: extract one file or page range
+
+    Returns (text, pages, page_offsets, more_ranges, error). With ``split``
+    set, a whole-file task counts the pages first; if there are more than
+    ``split`` it extracts only the first range and returns the others as
+    ``more_ranges`` so the parent can hand them to other workers.
+    """
+    try:
+        extractor = get_extractor(extractor)
+        more_ranges = []
+        if split:
+            count = extractor.page_count(pdf_path)
+            if count > split:
+                stop = split
+                more_ranges = [(first, min(first + split, count)) for first in range(split, count, split)]
+        text, pages, page_offsets = read_pdf(pdf_path, extractor, start, stop)
+        return text, pages, page_offsets, more_ranges, None
+    except Exception as e:
+        return None, 0, [], [], str(e)
+
+
+class _Worker:
+    """One extraction process running this module as a script, fed pickled tasks on stdin"""
+
+    def __init__(self):
+        self.process = subprocess.Popen([sys.executable, os.path.abspath(__file__)],
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.idle_since = None
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def run(self, task, token, results):
+        """Send one task and put (token, result) on results; the result is None if the process died"""
+        try:
+            pickle.dump(task, self.process.stdin)
+            self.process.stdin.flush()
+            result = pickle.load(self.process.stdout)
+        except Exception:
+            result = None
+        results.put((token, result))
+
+    def kill(self):
+        """Stop the process at once, returning its exit code"""
+        self.process.kill()
+        return self.process.wait()
+
+    def close(self):
+        """Let an idle process exit on its own by closing its input"""
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.kill()
+
+
+class ExtractionPool:
+    """Long-lived worker processes for PDF extraction
+
+    PyPDF2 parsing is pure Python and holds the GIL, so files are parsed in
+    separate processes. Workers start from this module alone rather than the
+    server's main script, so they do not import Flask or the model client,
+    and they stay around between batches so a single changed file does not
+    pay for a process start. Workers unused for ``idle_timeout`` seconds
+    exit, and every worker exits when the server does and its input closes.
+
+    The parent enforces the per-task timeout: a worker that has not answered
+    in time is killed, which works on every platform and also stops parsing
+    stuck in native extractor code. A task whose worker dies only fails its
+    own file.
+    """
+
+    def __init__(self, workers=1, idle_timeout=IDLE_WORKER_SECONDS):
+        self.workers = max(1, workers)
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._idle = []
+        self._reaper = None
+
+    def _checkout(self):
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.alive():
+                    return worker
+        return _Worker()
+
+    def _checkin(self, worker):
+        worker.idle_since = time.monotonic()
+        with self._lock:
+            self._idle.append(worker)
+            self._schedule_reap(self.idle_timeout)
+
+    def _schedule_reap(self, delay):
+        if self._reaper is None:
+            self._reaper = threading.Timer(delay, self._reap)
+            self._reaper.daemon = True
+            self._reaper.start()
+
+    def _reap(self):
+        now = time.monotonic()
+        with self._lock:
+            self._reaper = None
+            stale = [w for w in self._idle if now - w.idle_since >= self.idle_timeout]
+            self._idle = [w for w in self._idle if w not in stale]
+            if self._idle:
+                self._schedule_reap(min(w.idle_since for w in self._idle) + self.idle_timeout - now)
+        for worker in stale:
+            worker.close()
+
+    def close(self):
+        """Shut down every idle worker"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.close()
+
+    def extract(self, pdf_paths, timeout=None, extractor=None, pages_per_task=0):
+        """Extract PDFs across the workers, yielding (path, text, pages, page_offsets, error) as each finishes
+
+        Files of at least LARGE_PDF_BYTES are sent with ``pages_per_task``
+        so the worker that picks one up can split it into page ranges.
+        """
+        split = pages_per_task if self.workers > 1 else 0
+        todo = deque()
+        for path in pdf_paths:
+            try:
+                large = os.path.getsize(path) >= LARGE_PDF_BYTES
+            except OSError:
+                large = False  # Let the worker report the error
+            todo.append((path, 0, None, split if large else 0))
+        parts = {path: {} for path in pdf_paths}
+        outstanding = {path: 1 for path in pdf_paths}
+        running = {}
+        results = queue.Queue()
+
+        def failed(path, error):
+            if outstanding.pop(path, None) is None:
+                return None  # Another range of this file already failed
+            del parts[path]
+            return path, None, 0, [], error
+
+        try:
+            while todo or running:
+                while todo and len(running) < self.workers:
+                    path, start, stop, task_split = todo.popleft()
+                    if path not in outstanding:
+                        continue
+                    worker = self._checkout()
+                    token = object()
+                    running[token] = (path, start, worker, time.monotonic() + timeout if timeout else None)
+                    threading.Thread(target=worker.run, name='ingest-task', daemon=True,
+                                     args=((path, extractor, start, stop, task_split), token, results)).start()
+                if not running:
+                    continue
+
+                deadlines = [entry[3] for entry in running.values() if entry[3] is not None]
+                wait = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+                try:
+                    token, result = results.get(timeout=wait)
+                except queue.Empty:
+                    now = time.monotonic()
+                    for token, (path, start, worker, deadline) in list(running.items()):
+                        if deadline is not None and deadline <= now:
+                            del running[token]
+                            worker.kill()
+                            failure = failed(path, f"timed out after {timeout}s")
+                            if failure:
+                                yield failure
+                    continue
+
+                entry = running.pop(token, None)
+                if entry is None:
+                    continue  # Answer from a worker killed on timeout
+                path, start, worker, _ = entry
+                if result is None:
+                    code = worker.kill()
+                    failure = failed(path, f"extraction worker exited unexpectedly (exit code {code})")
+                    if failure:
+                        yield failure
+                    continue
+                self._checkin(worker)
+
+                text, pages, page_offsets, more_ranges, error = result
+                if path not in outstanding:
+                    continue
+                if error:
+                    yield failed(path, error)
+                    continue
+                parts[path][start] = (text, pages, page_offsets)
+                outstanding[path] += len(more_ranges) - 1
+                # Ranges of a split file go first so idle workers pick them up in parallel
+                todo.extendleft((path, first, last, 0) for first, last in reversed(more_ranges))
+                if not outstanding[path]:
+                    del outstanding[path]
+                    done = parts.pop(path)
+                    yield (path, *_merge_parts([done[first] for first in sorted(done)]), None)
+        finally:
+            # Only left over if the caller stopped early; the answers would go unread
+            for _, _, worker, _ in running.values():
+                worker.kill()
+
+
+def extract_pdfs(pdf_paths, pool=None, timeout=None, extractor=None, pages_per_task=0):
+    """Extract many PDFs, yielding (path, text, pages, page_offsets, error) as each finishes
+
+    With an ExtractionPool the files are spread across its worker processes,
+    each limited to ``timeout`` seconds, and files of at least
+    LARGE_PDF_BYTES with more than ``pages_per_task`` pages are split into
+    page ranges so one huge PDF is parsed by several workers at once.
+    Without one they are parsed in this process, one after another, and the
+    timeout cannot be enforced.
+    """
+    pdf_paths = [str(p) for p in pdf_paths]
+    extractor = resolve_extractor_name(extractor)
+
+    if pool is not None:
+        yield from pool.extract(pdf_paths, timeout, extractor, pages_per_task)
+        return
+
+    for path in pdf_paths:
+        try:
+            text, pages, page_offsets = read_pdf(path, extractor)
+            yield path, text, pages, page_offsets, None
+        except Exception as e:
+            yield path, None, 0, [], str(e)
+
+
+class IngestProgress:
+    """Thread-safe counters describing the current (or last) ingestion run"""
+
+    MAX_FAILURES = 50
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self, total=0, folder=None):
+        self.running = False
+        self.folder = folder
+        self.total = total
+        self.done = 0
+        self.cached = 0
+        self.failed = 0
+        self.pages = 0
+        self.extracted_pages = 0
+        self.failures = []
+        self.started_at = None
+        self.finished_at = None
+
+    def start(self, total, folder):
+        with self._lock:
+            self._reset(total, folder)
+            self.running = True
+            self.started_at = time.time()
+
+    def file_cached(self, pages):
+        with self._lock:
+            self.done += 1
+            self.cached += 1
+            self.pages += pages
+
+    def file_extracted(self, pages):
+        with self._lock:
+            self.done += 1
+            self.pages += pages
+            self.extracted_pages += pages
+
+    def file_failed(self, path, error):
+        with self._lock:
+            self.done += 1
+            self.failed += 1
+            if len(self.failures) < self.MAX_FAILURES:
+                self.failures.append({'file': os.path.basename(path), 'error': error})
+
+    def finish(self):
+        with self._lock:
+            self.running = False
+            self.finished_at = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            end = self.finished_at or time.time()
+            elapsed = end - self.started_at if self.started_at else 0.0
+            return {
+                'running': self.running,
+                'folder': self.folder,
+                'total': self.total,
+                'done': self.done,
+                'cached': self.cached,
+                'failed': self.failed,
+                'pages': self.pages,
+                'elapsed_seconds': round(elapsed, 2),
+                'files_per_sec': round(self.done / elapsed, 2) if elapsed else 0.0,
+                # Cache hits are nearly free, so throughput only counts parsed pages
+                'pages_per_sec': round(self.extracted_pages / elapsed, 2) if elapsed else 0.0,
+                'failures': list(self.failures)
+            }
+
+
+def _serve():
+    """Worker loop: answer pickled tasks from stdin until the parent closes it"""
+    # Results go over the original stdout; anything a library prints goes to stderr instead
+    channel = os.fdopen(os.dup(1), 'wb')
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+    tasks = sys.stdin.buffer
+    while True:
+        try:
+            task = pickle.load(tasks)
+        except EOFError:
+            return
+        pickle.dump(_extract_task(*task), channel)
+        channel.flush()
+
+
+if __name__ == '__main__':
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    logging.basicConfig(level=getattr(logging, LOG_LEVEL, logging.INFO),
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    if LOG_LEVEL == 'OFF':
+        logging.disable(logging.CRITICAL)
+    _serve()
@@ -0,0 +1,306 @@
+import heapq
+import math
+import re
+import sqlite3
+import threading
+from array import array
+from bisect import bisect_right
+from collections import Counter
+
+from context_packer import estimate_tokens
+from document_store import utf8_offsets
+
+CHUNK_SIZE = 1500
+CHUNK_OVERLAP = 200
+
+# Bump when chunking or tokenizing changes, so the persisted index is rebuilt
+INDEX_VERSION = 2
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+ARABIC_DIACRITICS_RE = re.compile(r'[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]')
+ARABIC_LETTER_MAP = str.maketrans({'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ة': 'ه', 'ى': 'ي'})
+
+STOPWORDS = frozenset("""
+a an and are as at be been but by can could did do does for from had has have how
+i if in into is it its of on or our should so such than that the their them then
+there these they this those to was we were what when where which who why will with
+would you your about between please provide
+في من على الى إلى عن مع هذا هذه ذلك التي الذي التى ما ماذا هل كيف لماذا هو هي ان أن
+او أو و ثم كان كانت
+""".split())
+
+
+def tokenize(text):
+    """Split text into normalized index terms (Arabic and English)"""
+    text = ARABIC_DIACRITICS_RE.sub('', text).translate(ARABIC_LETTER_MAP).casefold()
+    return [t for t in TOKEN_RE.findall(text) if len(t) > 1 and t not in STOPWORDS]
+
+
+def page_of(page_offsets, pos):
+    """1-based page number containing character offset ``pos``"""
+    return max(bisect_right(page_offsets, pos), 1)
+
+
+def chunk_document(text, page_offsets, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """Split a document into overlapping chunks, yielding (start, end, first_page, last_page)
+
+    Chunks prefer to end on a page boundary, then on whitespace, and never
+    carry overlap back across a page break.
+    """
+    n = len(text)
+    boundaries = set(page_offsets)
+    pos = 0
+    while pos < n:
+        end = min(pos + chunk_size, n)
+        if end < n:
+            floor = pos + chunk_size // 2
+            i = bisect_right(page_offsets, end) - 1
+            if i >= 0 and page_offsets[i] > floor:
+                end = page_offsets[i]
+            else:
+                space = text.rfind(' ', floor, end)
+                if space > floor:
+                    end = space
+        if text[pos:end].strip():
+            yield pos, end, page_of(page_offsets, pos), page_of(page_offsets, end - 1)
+        if end >= n:
+            break
+        if end in boundaries:
+            pos = end
+        else:
+            nxt = max(end - overlap, pos + 1)
+            space = text.find(' ', nxt, end)
+            pos = space + 1 if space != -1 else nxt
+
+
+class Chunk:
+    __slots__ = ('doc', 'start', 'end', 'first_page', 'last_page', 'length', 'tokens')
+
+    def __init__(self, doc, start, end, first_page, last_page, length, tokens):
+        self.doc = doc
+        self.start = start
+        self.end = end
+        self.first_page = first_page
+        self.last_page = last_page
+        self.length = length
+        self.tokens = tokens  # Estimated model tokens, so context packing need not re-read the text
+
+
+def prepare_chunks(text, page_offsets):
+    """Chunk and tokenize a document, returning [(start, end, first_page, last_page, term counts, tokens)]
+
+    Offsets are UTF-8 byte offsets into the document, and ``page_offsets``
+    character offsets into ``text``.
+    """
+    prepared = []
+    for start, end, first_page, last_page in chunk_document(text, page_offsets or [0]):
+        chunk_text = text[start:end]
+        counts = Counter(tokenize(chunk_text))
+        if counts:
+            prepared.append((start, end, first_page, last_page, counts, estimate_tokens(chunk_text)))
+    byte_offsets = utf8_offsets(text, [pos for chunk in prepared for pos in chunk[:2]])
+    return [(byte_offsets[start], byte_offsets[end], *rest) for start, end, *rest in prepared]
+
+
+class BM25Index:
+    """Inverted index over document chunks scored with Okapi BM25
+
+    Chunks and postings are persisted in SQLite keyed by the PDF's content
+    hash, so a warm start does not re-tokenize anything and every worker
+    process on the host shares one copy of the postings through the page
+    cache. Each process only keeps the chunks of the documents it has
+    loaded, and scores use statistics over those documents alone.
+    Chunks only keep UTF-8 byte offsets into their document, not a copy of
+    the text, so passages can be sliced straight out of the document store.
+    Text from a different extractor chunks differently, so switching
+    extractors starts the index over.
+    """
+
+    def __init__(self, db_path, extractor='pypdf2', k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._init_schema(f"{INDEX_VERSION}:{extractor}")
+        self.clear()
+
+    def _init_schema(self, index_format):
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            row = self._conn.execute("SELECT value FROM settings WHERE key = 'retrieval_index'").fetchone()
+            if not row or row[0] != index_format:
+                # The index is only derived data, so a format or extractor change just starts over
+                for table in ('index_postings', 'index_chunks', 'index_documents'):
+                    self._conn.execute(f"DROP TABLE IF EXISTS {table}")
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO settings (key, value) VALUES ('retrieval_index', ?)", (index_format,)
+                )
+            # Ids are never reused: another process may still map a pruned id to its old chunks
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS index_documents (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    sha256 TEXT NOT NULL UNIQUE
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS index_chunks (
+                    doc_id INTEGER NOT NULL,
+                    position INTEGER NOT NULL,
+                    start INTEGER NOT NULL,
+                    end INTEGER NOT NULL,
+                    first_page INTEGER NOT NULL,
+                    last_page INTEGER NOT NULL,
+                    length INTEGER NOT NULL,
+                    tokens INTEGER NOT NULL,
+                    PRIMARY KEY (doc_id, position)
+                ) WITHOUT ROWID
+            """)
+            # One row per term and document: (chunk position, term frequency) pairs packed as int32s
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS index_postings (
+                    term TEXT NOT NULL,
+                    doc_id INTEGER NOT NULL,
+                    postings BLOB NOT NULL,
+                    PRIMARY KEY (term, doc_id)
+                ) WITHOUT ROWID
+            """)
+
+    def clear(self):
+        """Forget every loaded document; the persisted index is kept"""
+        with self._lock:
+            self.docs = {}
+            self.doc_names = {}
+            self.chunk_count = 0
+            self.total_length = 0
+
+    def _load(self, name, sha256):
+        """(doc_id, chunks) of indexed content, or None if it has not been indexed"""
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM index_documents WHERE sha256 = ?", (sha256,)).fetchone()
+            if row is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT start, end, first_page, last_page, length, tokens FROM index_chunks "
+                "WHERE doc_id = ? ORDER BY position", (row[0],)
+            ).fetchall()
+        return row[0], tuple(Chunk(name, *chunk) for chunk in rows)
+
+    def _persist(self, sha256, prepared):
+        postings = {}
+        for position, chunk in enumerate(prepared):
+            for term, tf in chunk[4].items():
+                postings.setdefault(term, array('i')).extend((position, tf))
+        with self._lock, self._conn:
+            cursor = self._conn.execute("INSERT OR IGNORE INTO index_documents (sha256) VALUES (?)", (sha256,))
+            if not cursor.rowcount:
+                return  # Another process indexed the same content first
+            doc_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO index_chunks (doc_id, position, start, end, first_page, last_page, length, tokens) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(doc_id, position, start, end, first_page, last_page, sum(counts.values()), tokens)
+                 for position, (start, end, first_page, last_page, counts, tokens) in enumerate(prepared)]
+            )
+            self._conn.executemany(
+                "INSERT INTO index_postings (term, doc_id, postings) VALUES (?, ?, ?)",
+                [(term, doc_id, pairs.tobytes()) for term, pairs in postings.items()]
+            )
+
+    def add_document(self, name, sha256, load_text):
+        """Load a document into the index, replacing any previous version
+
+        ``load_text()`` returns (text, page_offsets), with page offsets in
+        characters, and is only called when this content has not been
+        indexed before.
+        """
+        loaded = self._load(name, sha256)
+        if loaded is None:
+            text, page_offsets = load_text()
+            self._persist(sha256, prepare_chunks(text, page_offsets))
+            loaded = self._load(name, sha256)
+
+        with self._lock:
+            self.remove_document(name)
+            doc_id, chunks = loaded
+            self.docs[name] = loaded
+            self.doc_names.setdefault(doc_id, set()).add(name)
+            self.chunk_count += len(chunks)
+            self.total_length += sum(chunk.length for chunk in chunks)
+
+    def remove_document(self, name):
+        with self._lock:
+            loaded = self.docs.pop(name, None)
+            if loaded is None:
+                return
+            doc_id, chunks = loaded
+            names = self.doc_names[doc_id]
+            names.discard(name)
+            if not names:
+                del self.doc_names[doc_id]
+            self.chunk_count -= len(chunks)
+            self.total_length -= sum(chunk.length for chunk in chunks)
+
+    def prune(self, keep_sha256s):
+        """Drop persisted documents whose content is no longer cached anywhere"""
+        with self._lock:
+            stale = [(doc_id,) for doc_id, sha256 in self._conn.execute("SELECT id, sha256 FROM index_documents")
+                     if sha256 not in keep_sha256s]
+        if stale:
+            with self._lock, self._conn:
+                self._conn.executemany("DELETE FROM index_postings WHERE doc_id = ?", stale)
+                self._conn.executemany("DELETE FROM index_chunks WHERE doc_id = ?", stale)
+                self._conn.executemany("DELETE FROM index_documents WHERE id = ?", stale)
+        return len(stale)
+
+    def search(self, query, docs=None, k=10):
+        """Return the top-k (score, Chunk) pairs, optionally limited to some documents"""
+        terms = set(tokenize(query))
+        allowed = set(docs) if docs is not None else None
+        with self._lock:
+            n = self.chunk_count
+            if not n or not terms:
+                return []
+            avg_length = self.total_length / n
+            scores = {}
+            for term in terms:
+                postings = []
+                df = 0
+                for doc_id, blob in self._conn.execute(
+                    "SELECT doc_id, postings FROM index_postings WHERE term = ?", (term,)
+                ):
+                    names = self.doc_names.get(doc_id)
+                    if names:
+                        pairs = array('i')
+                        pairs.frombytes(blob)
+                        postings.append((names, pairs))
+                        df += len(names) * len(pairs) // 2
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                for names, pairs in postings:
+                    for name in names:
+                        if allowed is not None and name not in allowed:
+                            continue
+                        chunks = self.docs[name][1]
+                        for i in range(0, len(pairs), 2):
+                            if pairs[i] >= len(chunks):
+                                continue  # Postings that do not belong to the chunks this process loaded
+                            chunk = chunks[pairs[i]]
+                            tf = pairs[i + 1]
+                            norm = self.k1 * (1 - self.b + self.b * chunk.length / avg_length)
+                            scores[chunk] = scores.get(chunk, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [(score, chunk) for chunk, score in best]
+
+    def spread_chunks(self, name, count=1):
+        """Evenly spaced chunks of a document, starting with the first one"""
+        with self._lock:
+            loaded = self.docs.get(name)
+            if loaded is None:
+                return []
+            chunks = loaded[1]
+            if count >= len(chunks):
+                return list(chunks)
+            step = len(chunks) / count
+            return [chunks[int(i * step)] for i in range(count)]
@@ -0,0 +1,53 @@
+import re
+import threading
+import time
+
+QUESTION_RE = re.compile(r'^Question: (.*)$', re.MULTILINE)
+BATCH_RE = re.compile(r'^Questions:\n(.*?)\n\nDocuments Content:', re.MULTILINE | re.DOTALL)
+NUMBERED_RE = re.compile(r'^(\d+)\. ', re.MULTILINE)
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    """Offline stand-in for genai.GenerativeModel
+
+    Answers after a fixed latency with text derived from the prompt, streams
+    it in a few pieces, and answers batched prompts in the batch format, so
+    the server can be exercised and load-tested without network access.
+    """
+
+    def __init__(self, latency=0.5, stream_chunks=5):
+        self.latency = latency
+        self.stream_chunks = stream_chunks
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _answer(self, prompt):
+        batch = BATCH_RE.search(prompt)
+        if batch:
+            count = len(NUMBERED_RE.findall(batch.group(1)))
+            return "\n".join(f"### Answer {i}\nStub answer {i} ({len(prompt)} prompt characters)."
+                             for i in range(1, count + 1))
+        question = QUESTION_RE.search(prompt)
+        question = question.group(1) if question else ''
+        return f"Stub answer to: {question} ({len(prompt)} prompt characters)."
+
+    def generate_content(self, prompt, stream=False):
+        with self._lock:
+            self.calls += 1
+        answer = self._answer(prompt)
+        if not stream:
+            time.sleep(self.latency)
+            return StubResponse(answer)
+        return self._stream(answer)
+
+    def _stream(self, answer):
+        size = max(1, -(-len(answer) // self.stream_chunks))
+        pieces = [answer[i:i + size] for i in range(0, len(answer), size)]
+        for piece in pieces:
+            time.sleep(self.latency / len(pieces))
+            yield StubResponse(piece)
@@ -0,0 +1,322 @@
+import hashlib
+import logging
+import queue
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+SECTION_CHARS = 12000
+
+# A combine group also ends after any summary whose hash is divisible by this,
+# so boundaries follow content rather than position and one changed document
+# only changes the groups around it
+GROUP_FANOUT = 8
+
+SECTION_PROMPT = """Summarize the following part of a scientific document in a few short paragraphs.
+Keep key findings, methods, numbers and named entities. Use the document's language.
+
+{text}"""
+
+COMBINE_PROMPT = """The following are summaries of consecutive parts of {subject}.
+Combine them into one coherent summary that keeps the main topics, key findings and important numbers.
+Use the language of the summaries.
+
+{text}"""
+
+
+def split_sections(text, page_offsets, max_chars=SECTION_CHARS):
+    """Split a document into runs of whole pages of at most max_chars (long pages are cut)"""
+    bounds = list(page_offsets or [0]) + [len(text)]
+    sections = []
+    start = bounds[0]
+    for page_start, page_end in zip(bounds, bounds[1:]):
+        if page_end - start > max_chars and page_start > start:
+            sections.append((start, page_start))
+            start = page_start
+        while page_end - start > max_chars:
+            sections.append((start, start + max_chars))
+            start += max_chars
+    if start < len(text):
+        sections.append((start, len(text)))
+    return [text[a:b] for a, b in sections if text[a:b].strip()]
+
+
+def _ends_group(summary):
+    return int(hashlib.sha256(summary.encode('utf-8')).hexdigest(), 16) % GROUP_FANOUT == 0
+
+
+def folder_fingerprint(documents):
+    """Version stamp for a set of {name: sha256} documents"""
+    digest = hashlib.sha256()
+    for name, sha256 in sorted(documents.items()):
+        digest.update(f"{name}\0{sha256}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class SummaryStore:
+    """Precomputed summaries keyed by document content hash, in SQLite
+
+    Section summaries are kept so an interrupted document can resume, and
+    document summaries are also held in memory because every summary-mode
+    question reads them. Group summaries are the intermediate results of
+    combining summaries, keyed by their prompt, so a folder summary only
+    re-combines the groups whose inputs changed.
+    """
+
+    def __init__(self, db_path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS section_summaries (
+                    sha256 TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    text TEXT NOT NULL,
+                    PRIMARY KEY (sha256, position)
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS document_summaries (
+                    sha256 TEXT PRIMARY KEY,
+                    text TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS folder_summaries (
+                    folder TEXT PRIMARY KEY,
+                    fingerprint TEXT NOT NULL,
+                    text TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS group_summaries (
+                    scope TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    PRIMARY KEY (scope, key)
+                )
+            """)
+            self._documents = dict(self._conn.execute("SELECT sha256, text FROM document_summaries"))
+
+    def document(self, sha256):
+        summary = self._documents.get(sha256)
+        if summary is None:
+            # Another worker process may have written it since we loaded
+            with self._lock:
+                row = self._conn.execute("SELECT text FROM document_summaries WHERE sha256 = ?", (sha256,)).fetchone()
+            if row:
+                summary = self._documents[sha256] = row[0]
+        return summary
+
+    def set_document(self, sha256, text):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO document_summaries (sha256, text) VALUES (?, ?)", (sha256, text))
+            self._conn.execute("DELETE FROM section_summaries WHERE sha256 = ?", (sha256,))
+            self._documents[sha256] = text
+
+    def section(self, sha256, position):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text FROM section_summaries WHERE sha256 = ? AND position = ?", (sha256, position)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_section(self, sha256, position, text):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO section_summaries (sha256, position, text) VALUES (?, ?, ?)",
+                (sha256, position, text)
+            )
+
+    def folder(self, folder, fingerprint):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text FROM folder_summaries WHERE folder = ? AND fingerprint = ?", (folder, fingerprint)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_folder(self, folder, fingerprint, text):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO folder_summaries (folder, fingerprint, text) VALUES (?, ?, ?)",
+                (folder, fingerprint, text)
+            )
+
+    def group(self, scope, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text FROM group_summaries WHERE scope = ? AND key = ?", (scope, key)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_group(self, scope, key, text):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO group_summaries (scope, key, text) VALUES (?, ?, ?)", (scope, key, text)
+            )
+
+    def keep_groups(self, scope, keys):
+        """Drop a scope's group summaries that its latest combine no longer used"""
+        with self._lock, self._conn:
+            cached = [row[0] for row in self._conn.execute("SELECT key FROM group_summaries WHERE scope = ?", (scope,))]
+            self._conn.executemany("DELETE FROM group_summaries WHERE scope = ? AND key = ?",
+                                   [(scope, key) for key in cached if key not in keys])
+
+    def prune(self, keep_sha256s):
+        """Forget document and section summaries of content that is no longer cached anywhere
+
+        ``keep_sha256s`` should cover every folder's extractions, not just the
+        loaded one, so switching back to a folder does not start over.
+        """
+        with self._lock, self._conn:
+            stale = {row[0] for row in self._conn.execute(
+                "SELECT sha256 FROM document_summaries UNION SELECT sha256 FROM section_summaries"
+            )} - set(keep_sha256s)
+            self._conn.executemany("DELETE FROM document_summaries WHERE sha256 = ?", [(s,) for s in stale])
+            self._conn.executemany("DELETE FROM section_summaries WHERE sha256 = ?", [(s,) for s in stale])
+            for sha in stale:
+                self._documents.pop(sha, None)
+        return len(stale)
+
+
+class SummaryPipeline:
+    """Background worker that builds section, document and folder summaries
+
+    ``load_document(name)`` returns (text, page_offsets, sha256) or None when
+    the document is gone, ``list_documents()`` returns the current
+    {name: sha256} of the folder, and ``generate(prompt)`` calls the model.
+    Documents whose content hash already has a summary are skipped, so only
+    new or changed documents cost model calls.
+    """
+
+    def __init__(self, store, load_document, list_documents, generate, max_chars=SECTION_CHARS):
+        self.store = store
+        self.load_document = load_document
+        self.list_documents = list_documents
+        self.generate = generate
+        self.max_chars = max_chars
+        self.folder = None
+        self._queue = queue.Queue()
+        self._folder_dirty = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the worker; documents enqueued before this wait in the queue"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='summary-pipeline', daemon=True)
+            self._thread.start()
+
+    def enqueue(self, name, sha256):
+        if self.store.document(sha256) is None:
+            self._queue.put(name)
+        self._folder_dirty.set()
+
+    def folder_changed(self, folder=None):
+        if folder is not None:
+            self.folder = folder
+        self._folder_dirty.set()
+        self._queue.put(None)  # Wake the worker even if no document needs work
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            name = self._queue.get()
+            if name is not None:
+                try:
+                    self.summarize_document(name)
+                except Exception as e:
+                    logger.warning("Error summarizing %s: %s", name, e)
+            if self._queue.empty() and self._folder_dirty.is_set():
+                self._folder_dirty.clear()
+                try:
+                    self.summarize_folder()
+                except Exception as e:
+                    logger.warning("Error summarizing folder %s: %s", self.folder, e)
+
+    def summarize_document(self, name):
+        loaded = self.load_document(name)
+        if loaded is None:
+            return
+        text, page_offsets, sha256 = loaded
+        if self.store.document(sha256) is not None:
+            return
+
+        sections = split_sections(text, page_offsets, self.max_chars)
+        summaries = []
+        for position, section in enumerate(sections):
+            summary = self.store.section(sha256, position)
+            if summary is None:
+                summary = self.generate(SECTION_PROMPT.format(text=section))
+                self.store.set_section(sha256, position, summary)
+            summaries.append(summary)
+
+        if len(summaries) == 1:
+            document_summary = summaries[0]
+        else:
+            document_summary = self.combine(summaries, f"the document '{name}'")
+        self.store.set_document(sha256, document_summary)
+        logger.info("Summarized %s (%d section(s))", name, len(sections))
+
+    def summarize_folder(self):
+        documents = self.list_documents()
+        if self.folder is None or not documents:
+            return
+        fingerprint = folder_fingerprint(documents)
+        if self.store.folder(self.folder, fingerprint) is not None:
+            return
+        summaries = [f"{name}: {self.store.document(sha)}" for name, sha in sorted(documents.items())
+                     if self.store.document(sha) is not None]
+        if len(summaries) < len(documents):
+            return  # Some documents are still being summarized; try again once they are done
+        self.store.set_folder(self.folder, fingerprint,
+                              self.combine(summaries, "a collection of documents", scope=self.folder))
+        logger.info("Summarized folder %s (%d document(s))", self.folder, len(documents))
+
+    def combine(self, summaries, subject, scope=None):
+        """Merge summaries, reducing in rounds when they do not fit in one prompt
+
+        With a ``scope`` each group's result is cached by its prompt, so
+        only groups whose inputs changed since the last combine in that
+        scope call the model, and results no longer used are dropped.
+        """
+        used = set()
+        while True:
+            merged = []
+            for group in self._groups(summaries):
+                prompt = COMBINE_PROMPT.format(subject=subject, text="\n\n".join(group))
+                key = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+                summary = self.store.group(scope, key) if scope else None
+                if summary is None:
+                    summary = self.generate(prompt)
+                    if scope:
+                        self.store.set_group(scope, key, summary)
+                used.add(key)
+                merged.append(summary)
+            if len(merged) == 1:
+                if scope:
+                    self.store.keep_groups(scope, used)
+                return merged[0]
+            summaries = merged
+
+    def _groups(self, summaries):
+        """Split one round of summaries into prompts of at most max_chars, ending groups at content boundaries"""
+        groups = [[]]
+        size = 0
+        for summary in summaries:
+            if groups[-1] and size + len(summary) > self.max_chars:
+                groups.append([])
+                size = 0
+            groups[-1].append(summary)
+            size += len(summary)
+            if _ends_group(summary):
+                groups.append([])
+                size = 0
+        groups = [group for group in groups if group]
+        if len(groups) == len(summaries) > 1:
+            # No two summaries shared a prompt; merge pairwise so each round shrinks
+            groups = [summaries[i:i + 2] for i in range(0, len(summaries), 2)]
+        return groups
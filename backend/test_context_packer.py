@@ -0,0 +1,48 @@
+import unittest
+
+from context_packer import Passage, estimate_tokens, pack_context
+
+SENTENCE = "The crew measured bone density loss in microgravity over one hundred and eighty days. "
+
+
+def document(index, sentences=20, rank=None):
+    name = f"doc{index:03d}.pdf"
+    return name, f"=== Document: {name} ===", [Passage(0, "--- Page 1 ---", SENTENCE * sentences, rank=rank)]
+
+
+class PackContextTest(unittest.TestCase):
+
+    def test_many_documents_keeps_the_most_relevant(self):
+        documents = [document(i) for i in range(300)]
+        packed = pack_context(documents, 8000)
+        self.assertTrue(packed.text.strip())
+        self.assertLessEqual(packed.tokens, 8000)
+        self.assertLessEqual(estimate_tokens(packed.text), 8000 + len(packed.sources))
+        # Documents are dropped from the end, not all at once
+        self.assertEqual(packed.sources, [name for name, _, _ in documents[:len(packed.sources)]])
+        self.assertGreater(len(packed.sources), 10)
+        self.assertLess(len(packed.sources), 300)
+
+    def test_ranked_passages_go_in_before_the_rest(self):
+        documents = [document(i) for i in range(200)]
+        documents.append(document(999, sentences=5, rank=0))
+        packed = pack_context(documents, 3000)
+        self.assertIn("doc999.pdf", packed.sources)
+        self.assertIn(SENTENCE * 5, packed.text)
+
+    def test_overview_survives_a_large_collection(self):
+        overview = ('', "=== Collection overview ===", [Passage(0, None, SENTENCE * 30, rank=0)])
+        summaries = [document(i, sentences=4) for i in range(500)]
+        packed = pack_context([overview] + summaries, 8000)
+        self.assertIn(SENTENCE * 30, packed.text)
+        self.assertIn("doc000.pdf", packed.sources)
+
+    def test_everything_fits_in_a_large_budget(self):
+        documents = [document(i, sentences=2) for i in range(5)]
+        packed = pack_context(documents, 100000)
+        self.assertEqual(len(packed.sources), 5)
+        self.assertEqual(packed.text.count(SENTENCE), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
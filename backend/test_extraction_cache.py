@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from document_store import DocumentStore
+from extraction_cache import ExtractionCache
+
+TEXTS = {
+    'a.pdf': "Bone density loss in mice during spaceflight.\n" * 50,
+    'b.pdf': "Plant growth under microgravity.\n" * 50,
+    'c.pdf': "Radiation shielding for crewed missions.\n" * 50,
+}
+
+
+class ExtractionCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.store = DocumentStore(os.path.join(self.folder, 'documents.bin'))
+        self.cache = ExtractionCache(os.path.join(self.folder, 'cache.db'), self.store)
+        self.paths = {}
+        for name, text in TEXTS.items():
+            path = self.paths[name] = os.path.join(self.folder, name)
+            with open(path, 'w') as f:
+                f.write(name)
+            self.cache.store(path, text, 1, [0])
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def read(self, name):
+        record, _ = self.cache.lookup(self.paths[name])
+        return self.store.read(record['offset'], record['length'], record['generation'])
+
+    def test_compaction_keeps_live_text_and_drops_dead_text(self):
+        os.remove(self.paths['a.pdf'])
+        os.remove(self.paths['b.pdf'])
+        self.cache.prune([])
+        old = self.store.size(0)
+
+        self.assertEqual(self.cache.compact(min_dead_bytes=0), 1)
+        self.assertEqual(self.read('c.pdf'), TEXTS['c.pdf'])
+        self.assertLess(self.store.size(1), old / 2)
+        self.assertEqual(self.cache.generation(), 1)
+
+    def test_previous_generation_is_removed_by_the_next_compaction(self):
+        os.remove(self.paths['a.pdf'])
+        self.cache.prune([])
+        self.assertEqual(self.cache.compact(min_dead_bytes=0), None)  # Less dead than live text
+        os.remove(self.paths['b.pdf'])
+        self.cache.prune([])
+        self.cache.compact(min_dead_bytes=0)
+        self.assertEqual(self.store.generations(), [0, 1])
+
+        self.cache.store(self.paths['c.pdf'], "Rewritten.\n" * 5, 1, [0])
+        self.assertEqual(self.cache.compact(min_dead_bytes=0), 2)
+        self.assertEqual(self.store.generations(), [1, 2])
+        self.assertEqual(self.read('c.pdf'), "Rewritten.\n" * 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from retrieval import BM25Index
+
+PAGES = [
+    "Bone density loss in mice during long duration spaceflight. " * 20,
+    "Plant growth and gene expression under microgravity conditions. " * 20,
+]
+TEXT = "\n".join(PAGES)
+PAGE_OFFSETS = [0, len(PAGES[0]) + 1]
+
+
+def not_needed():
+    raise AssertionError("the text should not be read again")
+
+
+class BM25IndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.folder, 'index.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_search_finds_the_matching_page(self):
+        index = BM25Index(self.db_path)
+        index.add_document('doc.pdf', 'sha-a', lambda: (TEXT, PAGE_OFFSETS))
+        score, chunk = index.search('plant gene expression', k=1)[0]
+        self.assertGreater(score, 0)
+        self.assertEqual((chunk.doc, chunk.first_page), ('doc.pdf', 2))
+
+    def test_indexed_content_is_reused_by_another_process(self):
+        BM25Index(self.db_path).add_document('doc.pdf', 'sha-a', lambda: (TEXT, PAGE_OFFSETS))
+        index = BM25Index(self.db_path)
+        index.add_document('copy.pdf', 'sha-a', not_needed)
+        self.assertEqual(index.search('bone density', k=1)[0][1].doc, 'copy.pdf')
+
+    def test_search_only_covers_loaded_documents(self):
+        index = BM25Index(self.db_path)
+        index.add_document('a.pdf', 'sha-a', lambda: (TEXT, PAGE_OFFSETS))
+        index.add_document('b.pdf', 'sha-b', lambda: (PAGES[0], [0]))
+        index.remove_document('a.pdf')
+        self.assertEqual({chunk.doc for _, chunk in index.search('bone plant')}, {'b.pdf'})
+        self.assertEqual(index.search('bone', docs=['a.pdf']), [])
+
+    def test_switching_extractors_starts_over(self):
+        BM25Index(self.db_path, 'pypdf2').add_document('doc.pdf', 'sha-a', lambda: (TEXT, PAGE_OFFSETS))
+        calls = []
+        index = BM25Index(self.db_path, 'pymupdf')
+        index.add_document('doc.pdf', 'sha-a', lambda: calls.append(1) or (TEXT, PAGE_OFFSETS))
+        self.assertEqual(calls, [1])
+
+    def test_prune_drops_content_no_longer_cached(self):
+        index = BM25Index(self.db_path)
+        index.add_document('a.pdf', 'sha-a', lambda: (TEXT, PAGE_OFFSETS))
+        index.add_document('b.pdf', 'sha-b', lambda: (PAGES[0], [0]))
+        self.assertEqual(index.prune({'sha-a'}), 1)
+        calls = []
+        BM25Index(self.db_path).add_document('b.pdf', 'sha-b', lambda: calls.append(1) or (PAGES[0], [0]))
+        self.assertEqual(calls, [1])
+
+    def test_pruned_ids_are_not_reused_under_another_process(self):
+        reader = BM25Index(self.db_path)
+        reader.add_document('old.pdf', 'sha-old', lambda: (TEXT, PAGE_OFFSETS))
+        writer = BM25Index(self.db_path)
+        writer.prune(set())
+        long_text = "Radiation shielding for crewed missions beyond low Earth orbit. " * 400
+        writer.add_document('new.pdf', 'sha-new', lambda: (long_text, [0]))
+        self.assertEqual(reader.search('radiation shielding missions'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from summaries import SummaryPipeline, SummaryStore
+
+
+class CountingModel:
+    def __init__(self):
+        self.prompts = []
+
+    def __call__(self, prompt):
+        self.prompts.append(prompt)
+        return f"summary {len(self.prompts)}"
+
+
+class SummaryPipelineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.store = SummaryStore(os.path.join(self.folder, 'summaries.db'))
+        self.model = CountingModel()
+        self.documents = {f'doc{i:02d}.pdf': f'sha-{i}' for i in range(60)}
+        for i, sha in enumerate(self.documents.values()):
+            self.store.set_document(sha, f"Findings of study {i}. " * 40)
+        self.pipeline = SummaryPipeline(self.store, lambda name: None, lambda: dict(self.documents),
+                                        self.model, max_chars=4000)
+        self.pipeline.folder = '/papers'
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_changing_one_document_only_recombines_its_groups(self):
+        self.pipeline.summarize_folder()
+        first_run = len(self.model.prompts)
+        self.assertGreater(first_run, 5)
+
+        self.documents['doc30.pdf'] = 'sha-new'
+        self.store.set_document('sha-new', "A different study entirely. " * 40)
+        self.pipeline.summarize_folder()
+        second_run = len(self.model.prompts) - first_run
+        self.assertLess(second_run, first_run / 2)
+
+    def test_prune_keeps_content_cached_for_other_folders(self):
+        self.store.set_section('sha-partial', 0, "first section")
+        self.assertEqual(self.store.prune({'sha-0', 'sha-1'}), 59)
+        self.assertIsNotNone(self.store.document('sha-1'))
+        self.assertIsNone(self.store.document('sha-2'))
+        self.assertIsNone(self.store.section('sha-partial', 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
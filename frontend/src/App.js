@@ -44,8 +44,14 @@ function usePDFManager() {
       const response = await fetch(`${API_URL}/api/reload`, { method: 'POST' });
       const data = await response.json();
       if (data.success) {
+        // Reloads run in the background; poll until the server is done
+        let progress;
+        do {
+          await new Promise(resolve => setTimeout(resolve, 500));
+          progress = await (await fetch(`${API_URL}/api/reload/progress`)).json();
+        } while (progress.reloading);
         await loadPDFs();
-        return { success: true, count: data.count };
+        return { success: true, count: progress.pdfs_loaded };
       }
     } catch (err) {
       setError('Failed to reload PDFs');
@@ -78,6 +84,32 @@ function usePDFManager() {
   };
 }
 
+async function* readServerSentEvents(response) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const raw = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = 'message';
+      let data = '';
+      for (const line of raw.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+      }
+      if (data) yield { event, data: JSON.parse(data) };
+    }
+  }
+}
+
 function useChatManager() {
   const [messages, setMessages] = useState([]);
   const [loading, setLoading] = useState(false);
@@ -93,23 +125,40 @@ function useChatManager() {
     setLoading(true);
 
     try {
-      const response = await fetch(`${API_URL}/api/ask`, {
+      const response = await fetch(`${API_URL}/api/ask/stream`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ question, mode, selected_pdfs: selectedPdfs })
       });
 
-      const data = await response.json();
-      
-      if (data.success) {
-        setMessages(prev => [...prev, {
-          type: 'assistant',
-          text: data.answer,
-          sources: data.sources,
-          mode: mode
-        }]);
+      // Validation errors come back as plain JSON before any streaming starts
+      if (!response.ok || !response.headers.get('Content-Type')?.includes('text/event-stream')) {
+        const data = await response.json();
+        return { success: false, error: data.error };
+      }
+
+      const id = Date.now();
+      let started = false;
+      const updateAnswer = (update) => {
+        if (!started) {
+          started = true;
+          setMessages(prev => [...prev, { id, type: 'assistant', text: '', sources: [], mode, ...update(null) }]);
+        } else {
+          setMessages(prev => prev.map(msg => (msg.id === id ? { ...msg, ...update(msg) } : msg)));
+        }
+      };
+
+      let result = { success: true };
+      for await (const { event, data } of readServerSentEvents(response)) {
+        if (event === 'token') {
+          updateAnswer(msg => ({ text: (msg ? msg.text : '') + data.text }));
+        } else if (event === 'done') {
+          updateAnswer(() => ({ sources: data.sources }));
+        } else if (event === 'error') {
+          result = { success: false, error: data.error };
+        }
       }
-      return { success: true };
+      return result;
     } catch (err) {
       return { success: false, error: err.message };
     } finally {
@@ -422,7 +471,7 @@ export default function App() {
                 {chatManager.messages.map((msg, idx) => (
                   <MessageBubble key={idx} message={msg} />
                 ))}
-                {chatManager.loading && (
+                {chatManager.loading && chatManager.messages[chatManager.messages.length - 1]?.type !== 'assistant' && (
                   <div className="flex justify-start mb-4">
                     <div className="bg-white border border-gray-200 rounded-2xl rounded-tl-sm px-5 py-4 shadow-sm">
                       <div className="flex gap-2">